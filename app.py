@@ -1,25 +1,32 @@
 import os
+import asyncio
+import functools
+from collections import OrderedDict
+from datetime import datetime
 from typing import Optional
-import uvicorn
 
 from fastapi import FastAPI, Request, Form, status
-from fastapi.responses import HTMLResponse, FileResponse, Response
+from fastapi.responses import HTMLResponse, FileResponse, Response, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
 
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.middleware.cors import CORSMiddleware
 from starlette.responses import RedirectResponse
 from starlette.datastructures import MutableHeaders
 
-from xion_handler import validate_wallet_address, get_wallet_info
-from risk_engine import calculate_risk_score
+from xion_client import validate_wallet_address, endpoint_health, endpoint_health_loop, HEALTH_INTERVAL
+from screening import screen_wallet
 from rwa_handler import get_rwa_assets
-from iso_export import generate_iso_pain001
-from metrics import log_metrics, fetch_metrics
-from utils import rate_limiter
+from metrics import (ensure_db, log_metrics, fetch_metrics, fetch_trends, run_maintenance,
+                     stream_metrics_export)
+from utils import rate_limiter, get_templates
+import profiling
+from compression import CompressionMiddleware, etag_matches
+import upstream_archive
+from workers import run_cpu, pool_stats, PoolBusy, shutdown as shutdown_workers
 
-from xion_explorer_scraper import get_xion_explorer_assets  # <-- fallback scraper
+# Heavy, rarely used modules (explorer scraper: requests/bs4, ISO export: lxml)
+# are imported inside the routes that need them to keep worker cold start fast.
 
 app = FastAPI()
 
@@ -66,9 +73,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# -------------------- Static & Templates --------------------
+# -------------------- Negotiated compression (zstd / br / gzip) --------------------
+app.add_middleware(CompressionMiddleware)
+
+# -------------------- Static --------------------
 app.mount("/static", StaticFiles(directory="static"), name="static")
-templates = Jinja2Templates(directory="templates")
 
 # -------------------- Simple IP rate limit --------------------
 @app.middleware("http")
@@ -78,15 +87,67 @@ async def ip_rate_limit_middleware(request: Request, call_next):
         return Response("Too many requests. Try again later.", status_code=status.HTTP_429_TOO_MANY_REQUESTS)
     return await call_next(request)
 
+# -------------------- Opt-in request profiling --------------------
+async def profiling_middleware(request: Request, call_next):
+    if not profiling.should_profile(request.headers):
+        return await call_next(request)
+    session = profiling.start(request.method, request.url.path)
+    if session is None:  # another request is being profiled
+        return await call_next(request)
+    try:
+        resp = await call_next(request)
+    finally:
+        await asyncio.to_thread(session.stop)
+    resp.headers["X-Xguard-Profile-Id"] = session.id
+    return resp
+
+# Only installed when configured: unprofiled deployments don't pay for an extra
+# BaseHTTPMiddleware layer on every request.
+if profiling.ENABLED:
+    app.middleware("http")(profiling_middleware)
+
+# -------------------- Metrics rollup & retention --------------------
+METRICS_MAINTENANCE_INTERVAL = int(os.getenv("METRICS_MAINTENANCE_INTERVAL", "60"))
+
+async def _metrics_maintenance_loop():
+    while True:
+        try:
+            await asyncio.to_thread(run_maintenance)
+        except Exception as e:
+            print("Metrics maintenance error:", e)
+        await asyncio.sleep(METRICS_MAINTENANCE_INTERVAL)
+
+# -------------------- Startup / shutdown --------------------
+@app.on_event("startup")
+async def startup():
+    # DB schema and Jinja environment are set up here rather than at import time.
+    await asyncio.to_thread(ensure_db)
+    get_templates()
+    app.state.metrics_task = asyncio.create_task(_metrics_maintenance_loop())
+    app.state.health_task = None
+    if HEALTH_INTERVAL > 0 and not upstream_archive.replaying():
+        app.state.health_task = asyncio.create_task(endpoint_health_loop())
+
+@app.on_event("shutdown")
+async def shutdown():
+    for name in ("metrics_task", "health_task"):
+        task = getattr(app.state, name, None)
+        if task:
+            task.cancel()
+    shutdown_workers()
+
 # -------------------- Health check --------------------
 @app.get("/healthz")
 async def healthz():
-    return {"ok": True, "release": os.getenv("RELEASE", "dev")}
+    endpoints = endpoint_health()
+    return {"ok": True, "release": os.getenv("RELEASE", "dev"),
+            "endpoints_available": sum(not e["circuit_open"] for e in endpoints.values()),
+            "endpoints": endpoints, "workers": pool_stats()}
 
 # -------------------- Routes --------------------
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+    return get_templates().TemplateResponse("index.html", {"request": request})
 
 @app.get("/validate")
 async def validate_get():
@@ -95,61 +156,21 @@ async def validate_get():
 @app.post("/validate", response_class=HTMLResponse)
 async def validate_post(request: Request, wallet_addr: str = Form(...)):
     if not validate_wallet_address(wallet_addr):
-        return templates.TemplateResponse(
+        return get_templates().TemplateResponse(
             "index.html",
             {"request": request, "result": "Invalid Xion address format.", "score": None,
              "wallet": None, "metrics": fetch_metrics()}
         )
-    w = await get_wallet_info(wallet_addr)
-    # --- PATCH: fallback to explorer scrape if no real balance ---
-    uxion_val = float(w.get("uxion") or w.get("balance_total") or 0)
-    tx_count_val = int(w.get("tx_count") or 0)
-    fallback_assets = None
-    if (uxion_val == 0.0 and tx_count_val == 0):
-        # REST failed, try scrape explorer
-        try:
-            fallback_assets = get_xion_explorer_assets(wallet_addr)
-            # PATCH: Paparkan semua asset explorer burnt.com
-            # Jumlahkan XION untuk balance, tapi fallback_assets dihantar penuh ke UI
-            if fallback_assets:
-                uxion_balances = [
-                    float(a["amount"].replace(",", ""))
-                    for a in fallback_assets
-                    if "XION" in a["symbol"] and a["amount"].replace(",", "").replace(".", "").isdigit()
-                ]
-                uxion_val = sum(uxion_balances) if uxion_balances else uxion_val
-        except Exception as e:
-            print("Fallback error:", e)
-            fallback_assets = None
-
-    # PATCH: show both REST and fallback assets
-    wallet_view = {
-        "address": w.get("address"),
-        "balance": f"{uxion_val} XION",
-        "tx_count": tx_count_val,
-        "failed_txs": int(w.get("failed_txs") or 0),
-        "anomaly": bool(w.get("anomaly", False)),
-        "status": (w.get("status") or "ok"),
-        "duration": float(w.get("duration") or 0.0),
-        "endpoint": w.get("endpoint"),
-        "balances": w.get("balances", []),           # REST balances (if any)
-        "fallback_assets": fallback_assets,           # fallback explorer assets
-    }
     try:
-        score = calculate_risk_score({
-            "status": wallet_view["status"],
-            "uxion": uxion_val,
-            "tx_count": wallet_view["tx_count"],
-            "failed_txs": wallet_view["failed_txs"],
-            "anomaly": wallet_view["anomaly"],
-        })
-    except Exception:
-        score = 50
+        wallet_view, score = await screen_wallet(wallet_addr)
+    except PoolBusy:
+        return Response("Validation workers busy. Try again later.", status_code=503,
+                        headers={"Retry-After": "2"})
     try:
         log_metrics(wallet_addr, wallet_view["duration"], score, wallet_view["status"])
     except Exception:
         pass
-    return templates.TemplateResponse(
+    return get_templates().TemplateResponse(
         "index.html",
         {
             "request": request,
@@ -162,26 +183,87 @@ async def validate_post(request: Request, wallet_addr: str = Form(...)):
 
 @app.get("/metrics", response_class=HTMLResponse)
 async def metrics_page(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request, "metrics": fetch_metrics()})
+    return get_templates().TemplateResponse("index.html", {"request": request, "metrics": fetch_metrics()})
+
+@app.get("/metrics/trends")
+async def metrics_trends(granularity: str = "hour", since: Optional[str] = None,
+                         until: Optional[str] = None, limit: int = 1000):
+    try:
+        rows = await asyncio.to_thread(fetch_trends, granularity, since, until, limit)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return {"granularity": granularity, "buckets": rows}
+
+@app.get("/metrics/export")
+async def metrics_export(format: str = "csv", since: Optional[str] = None, until: Optional[str] = None,
+                         address: Optional[str] = None, status: Optional[str] = None, gzip: bool = False):
+    if format not in ("csv", "jsonl"):
+        return JSONResponse({"error": "format must be csv or jsonl"}, status_code=400)
+    body = stream_metrics_export(format, gzip, since=since, until=until, address=address, status=status)
+    filename = f"metrics.{format}" + (".gz" if gzip else "")
+    media_type = "application/gzip" if gzip else ("text/csv" if format == "csv" else "application/x-ndjson")
+    # Sync generator: Starlette iterates it in a threadpool, so SQLite reads stay off the loop.
+    return StreamingResponse(body, media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
 
 @app.get("/rwa/assets", response_class=HTMLResponse)
 async def rwa_assets(request: Request):
     assets = await get_rwa_assets()
-    return templates.TemplateResponse("index.html", {"request": request, "rwa": assets})
+    return get_templates().TemplateResponse("index.html", {"request": request, "rwa": assets})
+
+# pain.001 exports are deterministic per (address, day): the ETag is derived from those
+# inputs, so If-None-Match hits return 304 without generating anything, and generated
+# documents are kept in a small LRU for repeat full downloads.
+EXPORT_CACHE_SIZE = int(os.getenv("XGUARD_EXPORT_CACHE_SIZE", "256"))
+_EXPORT_CACHE: "OrderedDict[str, str]" = OrderedDict()
 
 @app.get("/iso/pain001.xml")
-async def iso_export(wallet_addr: Optional[str] = None):
+async def iso_export(request: Request, wallet_addr: Optional[str] = None):
+    from iso_export import generate_iso_pain001, pain001_etag
     m = fetch_metrics()
     address = wallet_addr or (m[0]["address"] if m else None)
     if not address:
         return Response("No wallet address to export.", status_code=400)
-    xml_content = generate_iso_pain001(address)
+    day = datetime.utcnow().date()
+    etag = pain001_etag(address, day)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    xml_content = _EXPORT_CACHE.get(etag)
+    if xml_content is not None:
+        _EXPORT_CACHE.move_to_end(etag)
+    else:
+        try:
+            xml_content = await run_cpu("iso_pain001", functools.partial(generate_iso_pain001, day=day), address)
+        except PoolBusy:
+            return Response("Export workers busy. Try again later.", status_code=503,
+                            headers={"Retry-After": "2"})
+        _EXPORT_CACHE[etag] = xml_content
+        while len(_EXPORT_CACHE) > EXPORT_CACHE_SIZE:
+            _EXPORT_CACHE.popitem(last=False)
+    headers["Content-Disposition"] = f'attachment; filename=\"pain001-{address}.xml\"'
     return Response(
         content=xml_content,
         media_type="application/xml",
-        headers={"Content-Disposition": f'attachment; filename=\"pain001-{address}.xml\"'},
+        headers=headers,
     )
 
+# -------------------- Admin: profiles --------------------
+@app.get("/admin/profiles")
+async def admin_profiles(request: Request):
+    if not profiling.token_ok(request.headers.get("x-admin-token")):
+        return Response(status_code=404)
+    return {"profiles": await asyncio.to_thread(profiling.list_profiles)}
+
+@app.get("/admin/profiles/{name}")
+async def admin_profile_file(name: str, request: Request):
+    if not profiling.token_ok(request.headers.get("x-admin-token")):
+        return Response(status_code=404)
+    path = profiling.profile_path(name)
+    if not path:
+        return Response(status_code=404)
+    return FileResponse(path, filename=name, media_type="application/octet-stream")
+
 @app.get("/static/Xguard-logo.png")
 async def logo():
     return FileResponse("static/Xguard-logo.png")
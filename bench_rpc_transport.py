@@ -0,0 +1,144 @@
+"""
+Offline comparison of the REST and batched JSON-RPC wallet transports.
+
+    python bench_rpc_transport.py [--lookups 50] [--latency-ms 40]
+
+Starts a local mock Xion node that answers both the Cosmos REST paths and CometBFT
+JSON-RPC batches (abci_query + tx_search) for a fixed wallet, with an artificial
+per-request latency, then runs get_wallet_info against it over each transport and
+reports HTTP round-trips and wall time per lookup. Both transports must agree on the
+decoded wallet.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import xion_client
+import xion_rpc
+from xion_rpc import pb_bytes, pb_str, pb_uint
+
+WALLET = {
+    "balances": [("uxion", "2500000"), ("ibc/ABC", "42")],
+    "delegations": ["1000000"],
+    "unbonding": ["500000"],
+    "sent": 3,
+    "received": 2,
+}
+
+
+def _coin(denom: str, amount: str) -> bytes:
+    return pb_str(1, denom) + pb_str(2, amount)
+
+def _abci_value(path: str) -> bytes:
+    if path == xion_rpc.Q_ACCOUNT:
+        return pb_bytes(1, pb_str(1, "/cosmos.auth.v1beta1.BaseAccount") + pb_bytes(2, b"\x0a\x01x"))
+    if path in (xion_rpc.Q_BALANCES, xion_rpc.Q_SPENDABLE):
+        return b"".join(pb_bytes(1, _coin(d, a)) for d, a in WALLET["balances"])
+    if path == xion_rpc.Q_DELEGATIONS:
+        return b"".join(pb_bytes(1, pb_bytes(1, pb_str(1, "x")) + pb_bytes(2, _coin("uxion", a)))
+                        for a in WALLET["delegations"])
+    if path == xion_rpc.Q_UNBONDING:
+        entries = b"".join(pb_bytes(3, pb_uint(1, 1) + pb_str(3, a) + pb_str(4, a)) for a in WALLET["unbonding"])
+        return pb_bytes(1, pb_str(1, "x") + entries)
+    raise KeyError(path)
+
+def _rest_body(path: str):
+    if "/cosmos/auth/v1beta1/accounts/" in path:
+        return {"account": {"@type": "/cosmos.auth.v1beta1.BaseAccount"}}
+    if "/cosmos/bank/v1beta1/" in path:
+        return {"balances": [{"denom": d, "amount": a} for d, a in WALLET["balances"]]}
+    if path.endswith("/unbonding_delegations"):
+        return {"unbonding_responses": [{"entries": [{"balance": a} for a in WALLET["unbonding"]]}]}
+    if "/cosmos/staking/v1beta1/delegations/" in path:
+        return {"delegation_responses": [{"balance": {"denom": "uxion", "amount": a}} for a in WALLET["delegations"]]}
+    if "/cosmos/tx/v1beta1/txs" in path:
+        n = WALLET["sent"] if "message.sender" in path else WALLET["received"]
+        return {"pagination": {"total": str(n)}, "tx_responses": []}
+    return None
+
+
+class MockNode(BaseHTTPRequestHandler):
+    latency = 0.0
+    requests = 0
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, code: int, obj):
+        body = json.dumps(obj).encode() if obj is not None else b""
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _count(self):
+        with MockNode.lock:
+            MockNode.requests += 1
+        time.sleep(MockNode.latency)
+
+    def do_GET(self):
+        self._count()
+        body = _rest_body(self.path)
+        self._send(200 if body is not None else 404, body)
+
+    def do_POST(self):
+        self._count()
+        batch = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+        out = []
+        for call in batch:
+            if call["method"] == "abci_query":
+                value = _abci_value(call["params"]["path"])
+                result = {"response": {"code": 0, "value": base64.b64encode(value).decode()}}
+            else:
+                n = WALLET["sent"] if "message.sender" in call["params"]["query"] else WALLET["received"]
+                result = {"txs": [], "total_count": str(n)}
+            out.append({"jsonrpc": "2.0", "id": call["id"], "result": result})
+        self._send(200, out)
+
+
+async def _run(endpoint: str, address: str, lookups: int):
+    xion_client.ENDPOINTS = [endpoint]
+    xion_client._CB.clear()
+    MockNode.requests = 0
+    t0 = time.perf_counter()
+    info = None
+    for _ in range(lookups):
+        info = await xion_client.get_wallet_info(address)
+    dt = time.perf_counter() - t0
+    return info, MockNode.requests / lookups, dt / lookups * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--lookups", type=int, default=50)
+    ap.add_argument("--latency-ms", type=float, default=40.0)
+    args = ap.parse_args()
+
+    MockNode.latency = args.latency_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockNode)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    address = "xion1" + "q" * 38
+
+    try:
+        rest, rest_rt, rest_ms = asyncio.run(_run(base, address, args.lookups))
+        rpc, rpc_rt, rpc_ms = asyncio.run(_run(xion_rpc.RPC_PREFIX + base, address, args.lookups))
+    finally:
+        server.shutdown()
+
+    keys = ("status", "uxion", "liquid_uxion", "staked_uxion", "unbonding_uxion", "tx_count", "balances")
+    mismatched = [k for k in keys if rest.get(k) != rpc.get(k)]
+    print(f"latency per request: {args.latency_ms:.0f} ms, lookups: {args.lookups}")
+    print(f"REST   : {rest_rt:4.1f} round-trips/lookup, {rest_ms:7.1f} ms/lookup")
+    print(f"RPC    : {rpc_rt:4.1f} round-trips/lookup, {rpc_ms:7.1f} ms/lookup")
+    print("results match" if not mismatched else f"MISMATCH in {mismatched}: rest={rest} rpc={rpc}")
+
+
+if __name__ == "__main__":
+    main()
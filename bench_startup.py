@@ -0,0 +1,82 @@
+"""
+Cold-start benchmark for the FastAPI app.
+
+    python bench_startup.py [--runs 5] [--port 8765]
+
+1. Import cost: runs `python -X importtime -c "import app"` in a fresh interpreter and
+   reports total import time plus the heaviest modules (cumulative).
+2. Time-to-first-request: starts `uvicorn app:app` and polls /healthz until it answers.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def import_profile(top: int = 10):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=HERE, capture_output=True, text=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        try:
+            cumulative = int(parts[1])
+        except ValueError:
+            continue  # header line
+        rows.append((cumulative, parts[2].rstrip()))
+    app_total = next((us for us, name in rows if name.strip() == "app"), 0)
+    heaviest = sorted(rows, reverse=True)[:top]
+    return app_total, heaviest
+
+
+def time_to_first_request(port: int, timeout: float = 30.0) -> float:
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=HERE,
+    )
+    try:
+        url = f"http://127.0.0.1:{port}/healthz"
+        while time.perf_counter() - t0 < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=1) as r:
+                    if r.status == 200:
+                        return time.perf_counter() - t0
+            except Exception:
+                time.sleep(0.01)
+        raise RuntimeError("server did not answer /healthz in time")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--top", type=int, default=10)
+    args = ap.parse_args()
+
+    totals = []
+    for _ in range(args.runs):
+        total, heaviest = import_profile(args.top)
+        totals.append(total)
+    print(f"import app: min {min(totals) / 1000:.1f} ms, median {sorted(totals)[len(totals) // 2] / 1000:.1f} ms")
+    print("heaviest imports (cumulative, last run):")
+    for us, name in heaviest:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    ttfr = [time_to_first_request(args.port) for _ in range(args.runs)]
+    print(f"time to first request: min {min(ttfr) * 1000:.0f} ms, median {sorted(ttfr)[len(ttfr) // 2] * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Resumable bulk wallet screening over the same pipeline as /validate
+(get_wallet_info -> explorer fallback -> risk score).
+
+    python bulk_screen.py addresses.txt --out results.jsonl --concurrency 32 --qps 5
+    cat addresses.txt | python bulk_screen.py - --out results.csv --format csv --pain001 bulk.xml
+
+The output file is the checkpoint: rows are flushed as wallets finish, and on restart
+every address already present in --out is skipped (a torn last line from a crash is
+dropped first). Re-run the same command to resume. Lookups that reached no node are
+not written (so a resume retries them), and workers pause while every endpoint's
+circuit is open instead of draining the queue.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+
+from utils import set_node_qps
+from workers import set_queue_timeout
+from xion_client import endpoints_available, validate_wallet_address
+
+# Not screened at all: counted as errors and left for a resume, never checkpointed
+RETRY_STATUSES = ("unreachable", "error")
+BACKOFF_MIN, BACKOFF_MAX = 1.0, 60.0
+
+FIELDS = ["address", "status", "score", "balance", "tx_count", "failed_txs", "anomaly",
+          "endpoint", "duration", "fallback_explorer"]
+
+
+def read_addresses(src: str):
+    f = sys.stdin if src == "-" else open(src, encoding="utf-8")
+    try:
+        for line in f:
+            addr = line.strip()
+            if addr and not addr.startswith("#"):
+                yield addr
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def _truncate_torn_line(path: str):
+    with open(path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if not size:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        # Walk back to the last complete line
+        pos = size
+        while pos > 0:
+            step = min(65536, pos)
+            pos -= step
+            f.seek(pos)
+            nl = f.read(step).rfind(b"\n")
+            if nl >= 0:
+                f.truncate(pos + nl + 1)
+                return
+        f.truncate(0)
+
+
+def iter_results(path: str, fmt: str):
+    with open(path, encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def load_done(path: str, fmt: str) -> set:
+    if not os.path.exists(path):
+        return set()
+    _truncate_torn_line(path)
+    return {row["address"] for row in iter_results(path, fmt)}
+
+
+async def screen_one(address: str) -> dict:
+    if not validate_wallet_address(address):
+        return {"address": address, "status": "invalid_address", "score": None, "balance": None,
+                "tx_count": 0, "failed_txs": 0, "anomaly": True, "endpoint": None,
+                "duration": 0.0, "fallback_explorer": False}
+    from screening import screen_wallet
+    wallet_view, score = await screen_wallet(address)
+    return {
+        "address": address,
+        "status": wallet_view["status"],
+        "score": score,
+        "balance": wallet_view["balance"],
+        "tx_count": wallet_view["tx_count"],
+        "failed_txs": wallet_view["failed_txs"],
+        "anomaly": wallet_view["anomaly"],
+        "endpoint": wallet_view["endpoint"],
+        "duration": wallet_view["duration"],
+        "fallback_explorer": bool(wallet_view["fallback_assets"]),
+    }
+
+
+async def run(addresses, out_path: str, fmt: str, concurrency: int, flush_every: int = 100) -> dict:
+    done = load_done(out_path, fmt)
+    new_file = not os.path.exists(out_path) or os.path.getsize(out_path) == 0
+    out = open(out_path, "a", encoding="utf-8", newline="")
+    writer = csv.DictWriter(out, fieldnames=FIELDS) if fmt == "csv" else None
+    if writer and new_file:
+        writer.writeheader()
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 4)
+    stats = {"skipped": 0, "screened": 0, "errors": 0}
+    t0 = time.time()
+    backoff = {"delay": 0.0}
+
+    async def wait_for_nodes():
+        # Shared by all workers: grows on consecutive unreachable lookups, reset on success
+        backoff["delay"] = min(BACKOFF_MAX, max(BACKOFF_MIN, backoff["delay"] * 2))
+        await asyncio.sleep(backoff["delay"])
+        while not endpoints_available():
+            await asyncio.sleep(BACKOFF_MIN)
+
+    def write(row: dict):
+        if writer:
+            writer.writerow(row)
+        else:
+            out.write(json.dumps(row) + "\n")
+        stats["screened"] += 1
+        if stats["screened"] % flush_every == 0:
+            out.flush()
+            os.fsync(out.fileno())
+        if stats["screened"] % 1000 == 0:
+            rate = stats["screened"] / max(time.time() - t0, 1e-6)
+            print(f"[bulk] {stats['screened']} screened, {stats['skipped']} skipped, {rate:.1f}/s",
+                  file=sys.stderr)
+
+    async def worker():
+        while True:
+            addr = await queue.get()
+            if addr is None:
+                return
+            try:
+                row = await screen_one(addr)
+            except Exception as e:
+                # Not written, so a resume retries it
+                stats["errors"] += 1
+                print(f"[bulk] {addr}: {e}", file=sys.stderr)
+                continue
+            if row["status"] in RETRY_STATUSES:
+                stats["errors"] += 1
+                print(f"[bulk] {addr}: {row['status']}, backing off", file=sys.stderr)
+                await wait_for_nodes()
+                continue
+            backoff["delay"] = 0.0
+            write(row)
+
+    tasks = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    try:
+        seen = set()
+        for addr in addresses:
+            if addr in done or addr in seen:
+                stats["skipped"] += 1
+                continue
+            seen.add(addr)
+            await queue.put(addr)
+        for _ in tasks:
+            await queue.put(None)
+        await asyncio.gather(*tasks)
+    finally:
+        out.flush()
+        os.fsync(out.fileno())
+        out.close()
+    stats["seconds"] = round(time.time() - t0, 1)
+    return stats
+
+
+def write_bulk_pain001(results_path: str, fmt: str, xml_path: str) -> int:
+    from iso_export import write_iso_pain001_bulk
+
+    def screened():
+        for row in iter_results(results_path, fmt):
+            if row.get("status") != "invalid_address":
+                yield row["address"]
+
+    n = sum(1 for _ in screened())
+    return write_iso_pain001_bulk(xml_path, screened(), n)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("input", help="file with one address per line, or - for stdin")
+    ap.add_argument("--out", required=True, help="results file (also the resume checkpoint)")
+    ap.add_argument("--format", choices=["jsonl", "csv"], default=None,
+                    help="default: from --out extension (jsonl unless .csv)")
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--qps", type=float, default=0, help="max requests/second per node (0 = unlimited)")
+    ap.add_argument("--pain001", help="also write one bulk pain.001 XML for all screened wallets")
+    args = ap.parse_args()
+
+    fmt = args.format or ("csv" if args.out.endswith(".csv") else "jsonl")
+    if args.qps:
+        set_node_qps(args.qps)
+    set_queue_timeout(None)     # --concurrency may exceed the worker slots: wait, don't fail
+
+    stats = asyncio.run(run(read_addresses(args.input), args.out, fmt, max(1, args.concurrency)))
+    print(f"[bulk] done: {stats}", file=sys.stderr)
+    if args.pain001:
+        n = write_bulk_pain001(args.out, fmt, args.pain001)
+        print(f"[bulk] pain.001 with {n} payments -> {args.pain001}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
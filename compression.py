@@ -0,0 +1,195 @@
+"""
+Negotiated response compression (zstd / br / gzip) as a pure ASGI middleware, so it
+also works for StreamingResponse: each streamed chunk is compressed and flushed as it
+passes through.
+
+    XGUARD_COMPRESS_MIN_SIZE  smallest single-chunk body worth compressing (default: 500)
+    XGUARD_COMPRESS_LEVEL     gzip level (default: 6); br/zstd use comparable fast levels
+
+gzip is always available; br needs the optional `brotli` package and zstd the optional
+`zstandard` package, and are only offered when importable. A strong ETag gets the coding
+appended ("abc" -> "abc-gzip") because each encoding is a different representation;
+etag_matches() accepts either form in If-None-Match.
+"""
+import os
+import zlib
+from typing import List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+MIN_SIZE = int(os.getenv("XGUARD_COMPRESS_MIN_SIZE", "500"))
+GZIP_LEVEL = int(os.getenv("XGUARD_COMPRESS_LEVEL", "6"))
+
+PREFERENCE = ["zstd", "br", "gzip"]
+COMPRESSIBLE = ("text/", "application/json", "application/xml", "application/x-ndjson",
+                "application/javascript", "image/svg+xml")
+
+_AVAILABLE: Optional[List[str]] = None
+
+
+def available_encodings() -> List[str]:
+    global _AVAILABLE
+    if _AVAILABLE is None:
+        found = []
+        for enc, mod in (("zstd", "zstandard"), ("br", "brotli")):
+            try:
+                __import__(mod)
+                found.append(enc)
+            except ImportError:
+                pass
+        _AVAILABLE = found + ["gzip"]
+    return _AVAILABLE
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Best coding from an Accept-Encoding header (q-values honoured), or None."""
+    if not accept_encoding:
+        return None
+    q = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        if token:
+            q[token] = weight
+    best, best_q = None, 0.0
+    for enc in PREFERENCE:
+        if enc not in available_encodings():
+            continue
+        weight = q.get(enc, q.get("*", 0.0) if enc == "gzip" else 0.0)
+        if weight > best_q:
+            best, best_q = enc, weight
+    return best
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check that also accepts the coding-suffixed ETags set below."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    bare = etag.strip('"')
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        tag = tag.strip('"')
+        if tag == bare or any(tag == f"{bare}-{enc}" for enc in PREFERENCE):
+            return True
+    return False
+
+
+class _Encoder:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "zstd":
+            import zstandard
+            self._z = zstandard.ZstdCompressor(level=3).compressobj()
+        elif encoding == "br":
+            import brotli
+            self._z = brotli.Compressor(quality=5)
+        else:
+            self._z = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        """Compress and flush so the client can decode this chunk right away."""
+        if self.encoding == "zstd":
+            import zstandard
+            return self._z.compress(data) + self._z.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        if self.encoding == "br":
+            return self._z.process(data) + self._z.flush()
+        return self._z.compress(data) + self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "zstd":
+            return self._z.compress(data) + self._z.flush()
+        if self.encoding == "br":
+            return self._z.process(data) + self._z.finish()
+        return self._z.compress(data) + self._z.flush()
+
+
+def _compressible(headers: Headers, status: int) -> bool:
+    if status < 200 or status in (204, 206, 304) or "content-encoding" in headers:
+        return False
+    ctype = headers.get("content-type", "").lower()
+    return ctype.startswith(COMPRESSIBLE) or ctype.endswith(("+xml", "+json"))
+
+
+def _suffix_etag(headers: MutableHeaders, encoding: str):
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/") and etag.endswith('"'):
+        headers["ETag"] = f'{etag[:-1]}-{encoding}"'
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if not encoding:
+            return await self.app(scope, receive, send)
+
+        start = None
+        encoder: Optional[_Encoder] = None
+        passthrough = False
+        pending = b""
+
+        async def send_wrapper(message):
+            nonlocal start, encoder, passthrough, pending
+            if message["type"] == "http.response.start":
+                start = message          # held back until we know whether to compress
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                return await send(message)
+
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+            if encoder is None:
+                headers = MutableHeaders(raw=start["headers"])
+                if start["status"] == 304:
+                    # Must carry the same ETag and Vary as the 200 it revalidates
+                    headers.add_vary_header("Accept-Encoding")
+                    _suffix_etag(headers, encoding)
+                compressible = _compressible(headers, start["status"])
+                if not compressible:
+                    passthrough = True
+                    await send(start)
+                    return await send(message)
+                # Bodies often arrive in several chunks (e.g. via BaseHTTPMiddleware):
+                # buffer until the size threshold is reached or the body ends.
+                pending += body
+                if more and len(pending) < self.minimum_size:
+                    return
+                body, pending = pending, b""
+                headers.add_vary_header("Accept-Encoding")
+                if not more and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    return await send({"type": "http.response.body", "body": body, "more_body": False})
+                encoder = _Encoder(encoding)
+                headers["Content-Encoding"] = encoding
+                _suffix_etag(headers, encoding)
+                if more:
+                    if "content-length" in headers:
+                        del headers["content-length"]
+                    data = encoder.chunk(body)
+                else:
+                    data = encoder.finish(body)
+                    headers["Content-Length"] = str(len(data))
+                await send(start)
+                return await send({"type": "http.response.body", "body": data, "more_body": more})
+
+            data = encoder.chunk(body) if more else encoder.finish(body)
+            await send({"type": "http.response.body", "body": data, "more_body": more})
+
+        await self.app(scope, receive, send_wrapper)
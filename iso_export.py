@@ -1,10 +1,47 @@
 from lxml import etree
-from datetime import datetime
+from datetime import date, datetime
+import hashlib
 import uuid
+from typing import Iterable, Optional
 
 NS = "urn:iso:std:iso:20022:tech:xsd:pain.001.001.03"
 NSMAP = {None: NS}
 
+# Naikkan bila struktur/kandungan XML berubah: ia sebahagian daripada ID dan ETag.
+GENERATOR_VERSION = "2"
+
+def _seed(*parts) -> str:
+    """Hash input eksport; MsgId/PmtInfId/EndToEndId diambil daripadanya."""
+    return hashlib.sha256("|".join(map(str, (GENERATOR_VERSION,) + parts)).encode("utf-8")).hexdigest().upper()
+
+def _amount(amount) -> str:
+    # Normalisasi amaun ke 2 decimal
+    try:
+        return f"{float(amount):.2f}"
+    except Exception:
+        return "0.00"
+
+def _day(day: Optional[date]) -> date:
+    return day or datetime.utcnow().date()
+
+def pain001_etag(
+    wallet_addr: str,
+    day: Optional[date] = None,
+    amount: str | float = "0.00",
+    currency: str = "UXION",
+    debtor_name: str = "XGuard Xion Wallet",
+    creditor_name: str = "Beneficiary",
+    creditor_iban: str = "DE00000000000000000000",
+    svc_level: str = "SEPA",
+) -> str:
+    """
+    Strong ETag untuk generate_iso_pain001() dengan input yang sama, dikira tanpa
+    menjana XML (dokumen itu sepenuhnya ditentukan oleh input ini).
+    """
+    seed = _seed(wallet_addr, _day(day), _amount(amount), currency, debtor_name,
+                 creditor_name, creditor_iban, svc_level)
+    return '"' + seed[:32].lower() + '"'
+
 def _el(parent, tag, text=None):
     el = etree.SubElement(parent, tag)
     if text is not None:
@@ -19,6 +56,7 @@ def generate_iso_pain001(
     creditor_name: str = "Beneficiary",
     creditor_iban: str = "DE00000000000000000000",
     svc_level: str = "SEPA",
+    day: Optional[date] = None,
 ) -> str:
     """
     Hasilkan ISO 20022 pain.001.001.03 'Customer Credit Transfer Initiation'
@@ -26,18 +64,15 @@ def generate_iso_pain001(
 
     - wallet_addr dimasukkan di Debtor Account (Othr/Id) supaya jelas “on-chain account”.
     - amount & currency boleh override (default 0.00 UXION).
+    - Deterministik untuk (wallet_addr, day, parameter): ID diterbitkan daripada hash
+      input dan CreDtTm ialah tengah malam UTC hari itu (default: hari ini).
     """
-    # Normalisasi amaun ke 2 decimal
-    try:
-        amount = f"{float(amount):.2f}"
-    except Exception:
-        amount = "0.00"
-
-    now = datetime.utcnow()
-    msg_id = f"XGUARD-{now.strftime('%Y%m%d')}-{uuid.uuid4().hex[:8].upper()}"
-    pmt_inf_id = f"PMT-{uuid.uuid4().hex[:8].upper()}"
-    end_to_end_id = f"E2E-{uuid.uuid4().hex[:10].upper()}"
-    req_date = now.strftime("%Y-%m-%d")
+    amount = _amount(amount)
+    day = _day(day)
+    seed = _seed(wallet_addr, day, amount, currency, debtor_name, creditor_name,
+                 creditor_iban, svc_level)
+    msg_id = f"XGUARD-{day.strftime('%Y%m%d')}-{seed[:8]}"
+    req_date = day.isoformat()
 
     # <Document>
     doc = etree.Element("Document", nsmap=NSMAP)
@@ -48,15 +83,24 @@ def generate_iso_pain001(
     # ---- Group Header ----
     grp = _el(root, "GrpHdr")
     _el(grp, "MsgId", msg_id)
-    _el(grp, "CreDtTm", now.replace(microsecond=0).isoformat() + "Z")
+    _el(grp, "CreDtTm", f"{req_date}T00:00:00Z")
     _el(grp, "NbOfTxs", "1")
     _el(grp, "CtrlSum", amount)
     initg = _el(grp, "InitgPty")
     _el(initg, "Nm", "ADCX LAB VALIDATOR")
 
+    root.append(_pmt_inf(wallet_addr, amount, currency, debtor_name, creditor_name,
+                         creditor_iban, svc_level, req_date, seed))
+
+    # Serialize
+    xml_bytes = etree.tostring(doc, pretty_print=True, encoding="UTF-8", xml_declaration=True)
+    return xml_bytes.decode("utf-8")
+
+def _pmt_inf(wallet_addr, amount, currency, debtor_name, creditor_name, creditor_iban, svc_level, req_date, seed):
+    """One PmtInf block (debtor = wallet) with a single CdtTrfTxInf; IDs come from seed."""
     # ---- Payment Info ----
-    pmt = _el(root, "PmtInf")
-    _el(pmt, "PmtInfId", pmt_inf_id)
+    pmt = etree.Element("PmtInf")
+    _el(pmt, "PmtInfId", f"PMT-{seed[8:16]}")
     _el(pmt, "PmtMtd", "TRF")
     _el(pmt, "BtchBookg", "false")
     _el(pmt, "NbOfTxs", "1")
@@ -87,7 +131,7 @@ def generate_iso_pain001(
     cdt = _el(pmt, "CdtTrfTxInf")
 
     pmt_id = _el(cdt, "PmtId")
-    _el(pmt_id, "EndToEndId", end_to_end_id)
+    _el(pmt_id, "EndToEndId", f"E2E-{seed[16:26]}")
 
     amt = _el(cdt, "Amt")
     instd = _el(amt, "InstdAmt", amount)
@@ -103,7 +147,45 @@ def generate_iso_pain001(
     # Optional purpose/remittance untuk hias panjang & audit
     rmt = _el(cdt, "RmtInf")
     _el(rmt, "Ustrd", f"Validation export for {wallet_addr}")
+    return pmt
 
-    # Serialize
-    xml_bytes = etree.tostring(doc, pretty_print=True, encoding="UTF-8", xml_declaration=True)
-    return xml_bytes.decode("utf-8")
+def write_iso_pain001_bulk(
+    path: str,
+    wallet_addrs: Iterable[str],
+    n_txs: int,
+    amount: str | float = "0.00",
+    currency: str = "UXION",
+    debtor_name: str = "XGuard Xion Wallet",
+    creditor_name: str = "Beneficiary",
+    creditor_iban: str = "DE00000000000000000000",
+    svc_level: str = "SEPA",
+) -> int:
+    """
+    Tulis satu pain.001.001.03 untuk banyak wallet (satu PmtInf setiap wallet) terus
+    ke fail secara incremental (lxml xmlfile), jadi memori tetap walaupun jutaan wallet.
+    n_txs mesti sama dengan bilangan wallet_addrs (GrpHdr ditulis dahulu).
+    PmtInfId/EndToEndId setiap wallet sama seperti generate_iso_pain001() untuk hari itu.
+    """
+    amount = _amount(amount)
+    now = datetime.utcnow()
+    req_date = now.strftime("%Y-%m-%d")
+    written = 0
+    with etree.xmlfile(path, encoding="UTF-8") as xf:
+        xf.write_declaration()
+        with xf.element("Document", nsmap=NSMAP):
+            with xf.element("CstmrCdtTrfInitn"):
+                grp = etree.Element("GrpHdr")
+                _el(grp, "MsgId", f"XGUARD-{now.strftime('%Y%m%d')}-{uuid.uuid4().hex[:8].upper()}")
+                _el(grp, "CreDtTm", now.replace(microsecond=0).isoformat() + "Z")
+                _el(grp, "NbOfTxs", str(n_txs))
+                _el(grp, "CtrlSum", f"{float(amount) * n_txs:.2f}")
+                initg = _el(grp, "InitgPty")
+                _el(initg, "Nm", "ADCX LAB VALIDATOR")
+                xf.write(grp, pretty_print=True)
+                for addr in wallet_addrs:
+                    seed = _seed(addr, now.date(), amount, currency, debtor_name, creditor_name,
+                                 creditor_iban, svc_level)
+                    xf.write(_pmt_inf(addr, amount, currency, debtor_name, creditor_name,
+                                      creditor_iban, svc_level, req_date, seed), pretty_print=True)
+                    written += 1
+    return written
@@ -1,27 +1,60 @@
 import sqlite3
 import os
-from datetime import datetime
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, timedelta
+from itertools import groupby
 
 DB_PATH = "metrics.db"
 
+# Retention: raw rows older than this are pruned once they are rolled up.
+RAW_RETENTION_HOURS = float(os.getenv("METRICS_RAW_RETENTION_HOURS", "72"))
+# Per-minute rollups are kept for a shorter window than per-hour ones.
+MINUTE_RETENTION_DAYS = float(os.getenv("METRICS_MINUTE_RETENTION_DAYS", "14"))
+HOUR_RETENTION_DAYS = float(os.getenv("METRICS_HOUR_RETENTION_DAYS", "730"))
+PRUNE_BATCH = 5000
+
+# Rollup granularity -> length of the ISO timestamp prefix that identifies a bucket
+# ("2025-01-31T12:34" for a minute, "2025-01-31T12" for an hour).
+ROLLUPS = {"minute": 16, "hour": 13}
+SCORE_BANDS = [(0, 24), (25, 49), (50, 74), (75, 100)]
+
 def ensure_db():
-    if not os.path.exists(DB_PATH):
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS metrics (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT,
-            address TEXT,
-            duration REAL,
-            score INTEGER,
-            status TEXT
+    conn = sqlite3.connect(DB_PATH)
+    c = conn.cursor()
+    # Only takes effect on a fresh file; freed pages are reused either way.
+    c.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    # WAL (persistent per file): long export reads don't block log_metrics writers.
+    c.execute("PRAGMA journal_mode = WAL")
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS metrics (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT,
+        address TEXT,
+        duration REAL,
+        score INTEGER,
+        status TEXT
+    )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_metrics_timestamp ON metrics (timestamp)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_metrics_address ON metrics (address, timestamp)")
+    for name in ROLLUPS:
+        c.execute(f"""
+        CREATE TABLE IF NOT EXISTS metrics_{name} (
+            bucket TEXT PRIMARY KEY,
+            count INTEGER,
+            duration_mean REAL,
+            duration_p95 REAL,
+            score_mean REAL,
+            score_dist TEXT,
+            status_counts TEXT
         )
         """)
-        conn.commit()
-        conn.close()
-
-ensure_db()
+    c.execute("CREATE TABLE IF NOT EXISTS metrics_state (key TEXT PRIMARY KEY, value TEXT)")
+    conn.commit()
+    conn.close()
 
 def log_metrics(address: str, duration: float, score: int, status: str):
     conn = sqlite3.connect(DB_PATH)
@@ -42,4 +75,198 @@ def fetch_metrics():
     return [
         {"timestamp": r[0], "address": r[1], "duration": r[2], "score": r[3], "status": r[4]}
         for r in rows
-    ]
\ No newline at end of file
+    ]
+
+
+# =========================
+# Streaming export
+# =========================
+EXPORT_COLUMNS = ["timestamp", "address", "duration", "score", "status"]
+EXPORT_CHUNK = 1000
+
+def iter_metrics(since: str = None, until: str = None, address: str = None, status: str = None,
+                 chunk: int = EXPORT_CHUNK):
+    """
+    Yield lists of raw rows (oldest first) matching the filters, `chunk` rows at a time,
+    from a server-side cursor on a read-only connection. Only rows still within the raw
+    retention window exist; older history lives in the rollup tables.
+    """
+    where, args = ["timestamp >= ?", "timestamp < ?"], [since or "", until or "9999"]
+    if address:
+        where.append("address = ?")
+        args.append(address)
+    if status:
+        where.append("status = ?")
+        args.append(status)
+    # StreamingResponse advances this generator via iterate_in_threadpool, i.e. on a
+    # different worker thread per chunk; the connection is only ever used by one at a time.
+    conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True, check_same_thread=False)
+    try:
+        cur = conn.execute(
+            f"SELECT {', '.join(EXPORT_COLUMNS)} FROM metrics WHERE {' AND '.join(where)} ORDER BY timestamp",
+            args,
+        )
+        while True:
+            rows = cur.fetchmany(chunk)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+def stream_metrics_export(fmt: str = "csv", compress: bool = False, **filters):
+    """Encode iter_metrics() as CSV or JSONL byte chunks, optionally as one gzip stream."""
+    if fmt not in ("csv", "jsonl"):
+        raise ValueError("format must be csv or jsonl")
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def emit(text: str) -> bytes:
+        data = text.encode("utf-8")
+        return gz.compress(data) if gz else data
+
+    if fmt == "csv":
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(EXPORT_COLUMNS)
+        yield emit(buf.getvalue())
+    for rows in iter_metrics(**filters):
+        if fmt == "csv":
+            buf.seek(0)
+            buf.truncate()
+            writer.writerows(rows)
+            out = emit(buf.getvalue())
+        else:
+            out = emit("".join(json.dumps(dict(zip(EXPORT_COLUMNS, r))) + "\n" for r in rows))
+        if out:
+            yield out
+    if gz:
+        yield gz.flush()
+
+
+# =========================
+# Rollups & retention
+# =========================
+def _p95(values: list) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(0.95 * (len(values) - 1))))]
+
+def _score_band(score) -> str:
+    for lo, hi in SCORE_BANDS:
+        if score is not None and lo <= score <= hi:
+            return f"{lo}-{hi}"
+    return "unknown"
+
+def _aggregate(rows: list) -> tuple:
+    durations = [float(r[1] or 0.0) for r in rows]
+    scores = [r[2] for r in rows if r[2] is not None]
+    dist, statuses = {}, {}
+    for r in rows:
+        band = _score_band(r[2])
+        dist[band] = dist.get(band, 0) + 1
+        st = r[3] or "unknown"
+        statuses[st] = statuses.get(st, 0) + 1
+    return (
+        len(rows),
+        round(sum(durations) / len(durations), 4) if durations else 0.0,
+        round(_p95(durations), 4),
+        round(sum(scores) / len(scores), 2) if scores else None,
+        json.dumps(dist, sort_keys=True),
+        json.dumps(statuses, sort_keys=True),
+    )
+
+def _get_state(c, key: str):
+    c.execute("SELECT value FROM metrics_state WHERE key = ?", (key,))
+    row = c.fetchone()
+    return row[0] if row else None
+
+def _set_state(c, key: str, value: str):
+    c.execute("INSERT OR REPLACE INTO metrics_state (key, value) VALUES (?, ?)", (key, value))
+
+def rollup_metrics(now: datetime = None) -> dict:
+    """
+    Aggregate raw rows of every *completed* minute/hour bucket into metrics_minute /
+    metrics_hour. Each granularity keeps a watermark (start of the first bucket not yet
+    rolled up), so every raw row is read at most once per granularity.
+    """
+    now = now or datetime.utcnow()
+    conn = sqlite3.connect(DB_PATH)
+    c = conn.cursor()
+    written = {}
+    for name, width in ROLLUPS.items():
+        upto = now.isoformat()[:width]           # current (still open) bucket
+        since = _get_state(c, f"rollup_{name}") or ""
+        rows = conn.execute(
+            "SELECT timestamp, duration, score, status FROM metrics "
+            "WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp",
+            (since, upto),
+        )
+        n = 0
+        for bucket, group in groupby(rows, key=lambda r: r[0][:width]):
+            c.execute(
+                f"INSERT OR REPLACE INTO metrics_{name} "
+                "(bucket, count, duration_mean, duration_p95, score_mean, score_dist, status_counts) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (bucket,) + _aggregate(list(group)),
+            )
+            n += 1
+        _set_state(c, f"rollup_{name}", upto)
+        written[name] = n
+    conn.commit()
+    conn.close()
+    return written
+
+def prune_metrics(now: datetime = None) -> int:
+    """
+    Delete raw rows past RAW_RETENTION_HOURS (never past the hourly rollup watermark,
+    so nothing is dropped before it is aggregated) and expire old rollup rows.
+    Deletes run in small batches so writers are not locked out for long.
+    """
+    now = now or datetime.utcnow()
+    conn = sqlite3.connect(DB_PATH)
+    c = conn.cursor()
+    cutoff = (now - timedelta(hours=RAW_RETENTION_HOURS)).isoformat()
+    cutoff = min(cutoff, _get_state(c, "rollup_hour") or "")
+    deleted = 0
+    while True:
+        c.execute(
+            "DELETE FROM metrics WHERE id IN "
+            "(SELECT id FROM metrics WHERE timestamp < ? LIMIT ?)",
+            (cutoff, PRUNE_BATCH),
+        )
+        conn.commit()
+        deleted += c.rowcount
+        if c.rowcount < PRUNE_BATCH:
+            break
+    for name, days in (("minute", MINUTE_RETENTION_DAYS), ("hour", HOUR_RETENTION_DAYS)):
+        c.execute(f"DELETE FROM metrics_{name} WHERE bucket < ?",
+                  ((now - timedelta(days=days)).isoformat()[:ROLLUPS[name]],))
+    conn.commit()
+    c.execute("PRAGMA incremental_vacuum")
+    conn.close()
+    return deleted
+
+def run_maintenance() -> dict:
+    written = rollup_metrics()
+    return {"rolled_up": written, "pruned": prune_metrics()}
+
+def fetch_trends(granularity: str = "hour", since: str = None, until: str = None, limit: int = 1000):
+    """Read pre-aggregated buckets; cost depends on the number of buckets, not raw rows."""
+    if granularity not in ROLLUPS:
+        raise ValueError(f"granularity must be one of {sorted(ROLLUPS)}")
+    conn = sqlite3.connect(DB_PATH)
+    c = conn.cursor()
+    c.execute(
+        f"SELECT bucket, count, duration_mean, duration_p95, score_mean, score_dist, status_counts "
+        f"FROM metrics_{granularity} WHERE bucket >= ? AND bucket <= ? ORDER BY bucket DESC LIMIT ?",
+        ((since or "")[:ROLLUPS[granularity]], until or "9999", max(1, min(int(limit), 10000))),
+    )
+    rows = c.fetchall()
+    conn.close()
+    return [
+        {"bucket": r[0], "count": r[1], "duration_mean": r[2], "duration_p95": r[3],
+         "score_mean": r[4], "score_dist": json.loads(r[5] or "{}"),
+         "status_counts": json.loads(r[6] or "{}")}
+        for r in reversed(rows)
+    ]
@@ -0,0 +1,150 @@
+"""
+Opt-in per-request profiling.
+
+    XGUARD_ADMIN_TOKEN          enables the trigger header and the /admin/profiles routes
+    XGUARD_PROFILE_SAMPLE       fraction of requests profiled automatically (default: 0)
+    XGUARD_PROFILE_DIR          output directory (default: profiles)
+    XGUARD_PROFILE_INTERVAL_MS  stack sampling interval (default: 5)
+    XGUARD_PROFILE_KEEP         newest profiles kept on disk (default: 200)
+
+A request is profiled when it carries `X-Xguard-Profile: <admin token>` or falls in the
+sampled fraction. While it runs, a sampler thread records the stacks of every thread
+(event loop, worker pool, to_thread helpers) and tracemalloc traces allocations. Output:
+
+    <id>.folded        collapsed stacks ("thread;frame;frame count"), for flamegraph.pl / speedscope
+    <id>.tracemalloc   tracemalloc.Snapshot.dump(), load with tracemalloc.Snapshot.load()
+
+Time spent idle in the event loop's selector shows up as network wait. Only one request
+is profiled at a time, and other requests running meanwhile appear in the same samples.
+With nothing configured the middleware is not installed at all.
+"""
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from typing import Dict, List, Optional
+
+ADMIN_TOKEN = os.getenv("XGUARD_ADMIN_TOKEN", "")
+SAMPLE = float(os.getenv("XGUARD_PROFILE_SAMPLE", "0"))
+PROFILE_DIR = os.getenv("XGUARD_PROFILE_DIR", "profiles")
+INTERVAL = float(os.getenv("XGUARD_PROFILE_INTERVAL_MS", "5")) / 1000
+KEEP = int(os.getenv("XGUARD_PROFILE_KEEP", "200"))
+HEADER = "x-xguard-profile"
+
+ENABLED = bool(ADMIN_TOKEN) or SAMPLE > 0
+PROFILE_NAME_RE = re.compile(r"^[0-9A-Za-z_\-]+\.(folded|tracemalloc)$")
+
+_BUSY = threading.Lock()
+
+
+def token_ok(value: Optional[str]) -> bool:
+    # Compare bytes: compare_digest rejects non-ASCII str, and header values can be any latin-1
+    if not ADMIN_TOKEN or not value:
+        return False
+    return hmac.compare_digest(value.encode("utf-8", "surrogateescape"), ADMIN_TOKEN.encode("utf-8"))
+
+def should_profile(headers) -> bool:
+    if ADMIN_TOKEN and HEADER in headers:
+        return token_ok(headers.get(HEADER))
+    return SAMPLE > 0 and random.random() < SAMPLE
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _Sampler(threading.Thread):
+    def __init__(self):
+        super().__init__(name="xguard-profiler", daemon=True)
+        self.counts: Dict[str, int] = {}
+        self._stop_evt = threading.Event()
+
+    def run(self):
+        me = threading.get_ident()
+        while not self._stop_evt.wait(INTERVAL):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                stack: List[str] = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(tid, f"thread-{tid}"))
+                key = ";".join(reversed(stack))
+                self.counts[key] = self.counts.get(key, 0) + 1
+
+    def stop(self):
+        self._stop_evt.set()
+        self.join()
+
+
+class ProfileSession:
+    def __init__(self, method: str, path: str):
+        slug = re.sub(r"[^0-9A-Za-z]+", "_", path).strip("_") or "root"
+        self.id = f"{time.strftime('%Y%m%dT%H%M%S')}-{method.lower()}-{slug[:40]}-{uuid.uuid4().hex[:6]}"
+        self._own_tracemalloc = not tracemalloc.is_tracing()
+        if self._own_tracemalloc:
+            tracemalloc.start(25)
+        self._sampler = _Sampler()
+        self._sampler.start()
+
+    def stop(self):
+        """Stop sampling and write the profile files (blocking: call off the event loop)."""
+        try:
+            self._sampler.stop()
+            snapshot = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+            if self._own_tracemalloc:
+                tracemalloc.stop()
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            with open(os.path.join(PROFILE_DIR, self.id + ".folded"), "w", encoding="utf-8") as f:
+                for stack, n in sorted(self._sampler.counts.items()):
+                    f.write(f"{stack} {n}\n")
+            if snapshot is not None:
+                snapshot.dump(os.path.join(PROFILE_DIR, self.id + ".tracemalloc"))
+            _prune()
+        finally:
+            _BUSY.release()
+
+
+def start(method: str, path: str) -> Optional[ProfileSession]:
+    """Begin profiling, or None if another request is already being profiled."""
+    if not _BUSY.acquire(blocking=False):
+        return None
+    try:
+        return ProfileSession(method, path)
+    except Exception:
+        _BUSY.release()
+        raise
+
+
+def list_profiles() -> List[Dict]:
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    out = []
+    for name in os.listdir(PROFILE_DIR):
+        if PROFILE_NAME_RE.match(name):
+            st = os.stat(os.path.join(PROFILE_DIR, name))
+            out.append({"name": name, "bytes": st.st_size, "mtime": round(st.st_mtime, 3)})
+    return sorted(out, key=lambda p: p["mtime"], reverse=True)
+
+def profile_path(name: str) -> Optional[str]:
+    if not PROFILE_NAME_RE.match(name):
+        return None
+    path = os.path.join(PROFILE_DIR, name)
+    return path if os.path.isfile(path) else None
+
+def _prune():
+    ids = sorted({p["name"].rsplit(".", 1)[0] for p in list_profiles()}, reverse=True)
+    for old in ids[KEEP:]:
+        for ext in (".folded", ".tracemalloc"):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, old + ext))
+            except OSError:
+                pass
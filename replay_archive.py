@@ -0,0 +1,68 @@
+"""
+Re-run the wallet pipeline (get_wallet_info -> explorer fallback -> risk score ->
+pain.001 export) over every wallet in an upstream archive, with no network access.
+
+    # 1. record while serving or screening normally
+    XGUARD_ARCHIVE=record uvicorn app:app
+    # 2. re-score offline, e.g. after tuning risk_engine
+    python replay_archive.py --archive upstream_archive --out rescored.jsonl [--iso]
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+import upstream_archive
+from workers import set_queue_timeout
+
+
+async def _replay_one(address: str, with_iso: bool) -> dict:
+    from screening import screen_wallet
+    wallet_view, score = await screen_wallet(address)
+    row = {"address": address, "score": score, "status": wallet_view["status"],
+           "balance": wallet_view["balance"], "tx_count": wallet_view["tx_count"],
+           "anomaly": wallet_view["anomaly"]}
+    if with_iso:
+        from iso_export import generate_iso_pain001
+        row["pain001_bytes"] = len(generate_iso_pain001(address))
+    return row
+
+
+async def replay(addresses, out, with_iso: bool = False, batch: int = 256) -> int:
+    n = 0
+    for i in range(0, len(addresses), batch):
+        rows = await asyncio.gather(*(_replay_one(a, with_iso) for a in addresses[i:i + batch]))
+        for row in rows:
+            out.write(json.dumps(row) + "\n")
+        n += len(rows)
+    return n
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--archive", default=upstream_archive.ARCHIVE_DIR)
+    ap.add_argument("--out", default="-", help="JSONL output file (default: stdout)")
+    ap.add_argument("--iso", action="store_true", help="also build the pain.001 export per wallet")
+    ap.add_argument("--limit", type=int, default=0)
+    args = ap.parse_args()
+
+    upstream_archive.set_mode("replay", args.archive)
+    set_queue_timeout(None)     # a batch can outnumber the pool slots: wait, don't drop
+    addresses = upstream_archive.archived_addresses()
+    if args.limit:
+        addresses = addresses[:args.limit]
+
+    out = sys.stdout if args.out == "-" else open(args.out, "w", encoding="utf-8")
+    t0 = time.perf_counter()
+    try:
+        n = asyncio.run(replay(addresses, out, args.iso))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    dt = time.perf_counter() - t0
+    print(f"replayed {n} wallets in {dt:.2f}s ({n / dt if dt else 0:.0f}/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+from typing import Any, Dict, Tuple
+
+from xion_client import get_wallet_info
+from risk_engine import calculate_risk_score
+from workers import PoolBusy
+
+
+async def screen_wallet(wallet_addr: str) -> Tuple[Dict[str, Any], int]:
+    """
+    Wallet lookup + explorer fallback + risk score, as shown on /validate.
+    Returns (wallet_view, score). Shared by the web route and offline replays.
+    Raises PoolBusy when the explorer fallback can't get a worker, rather than
+    scoring the wallet without it.
+    """
+    w = await get_wallet_info(wallet_addr)
+    # --- PATCH: fallback to explorer scrape if no real balance ---
+    uxion_val = float(w.get("uxion") or w.get("balance_total") or 0)
+    tx_count_val = int(w.get("tx_count") or 0)
+    fallback_assets = None
+    if (uxion_val == 0.0 and tx_count_val == 0):
+        # REST failed, try scrape explorer
+        try:
+            from xion_explorer_scraper import get_xion_explorer_assets_async
+            fallback_assets = await get_xion_explorer_assets_async(wallet_addr)
+            # PATCH: Paparkan semua asset explorer burnt.com
+            # Jumlahkan XION untuk balance, tapi fallback_assets dihantar penuh ke UI
+            if fallback_assets:
+                uxion_balances = [
+                    float(a["amount"].replace(",", ""))
+                    for a in fallback_assets
+                    if "XION" in a["symbol"] and a["amount"].replace(",", "").replace(".", "").isdigit()
+                ]
+                uxion_val = sum(uxion_balances) if uxion_balances else uxion_val
+        except PoolBusy:
+            raise
+        except Exception as e:
+            print("Fallback error:", e)
+            fallback_assets = None
+
+    # PATCH: show both REST and fallback assets
+    wallet_view = {
+        "address": w.get("address"),
+        "balance": f"{uxion_val} XION",
+        "tx_count": tx_count_val,
+        "failed_txs": int(w.get("failed_txs") or 0),
+        "anomaly": bool(w.get("anomaly", False)),
+        "status": (w.get("status") or "ok"),
+        "duration": float(w.get("duration") or 0.0),
+        "endpoint": w.get("endpoint"),
+        "balances": w.get("balances", []),           # REST balances (if any)
+        "fallback_assets": fallback_assets,           # fallback explorer assets
+    }
+    try:
+        score = calculate_risk_score({
+            "status": wallet_view["status"],
+            "uxion": uxion_val,
+            "tx_count": wallet_view["tx_count"],
+            "failed_txs": wallet_view["failed_txs"],
+            "anomaly": wallet_view["anomaly"],
+        })
+    except Exception:
+        score = 50
+    return wallet_view, score
@@ -0,0 +1,131 @@
+"""
+Opt-in record/replay archive of raw upstream responses.
+
+    XGUARD_ARCHIVE=record   every REST/explorer response is also written to the archive
+    XGUARD_ARCHIVE=replay   responses are served from the archive only (no network)
+    XGUARD_ARCHIVE_DIR      archive location (default: upstream_archive)
+
+Layout is content-addressed: response bodies are zlib-compressed and stored once per
+sha256 under objects/<aa>/<sha256>.z, and index.jsonl maps a request key to the HTTP
+status and body hash. REST keys leave out the node base URL, so a recording made
+against one endpoint replays on any of them.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import zlib
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+MODE = (os.getenv("XGUARD_ARCHIVE") or "off").strip().lower()
+ARCHIVE_DIR = os.getenv("XGUARD_ARCHIVE_DIR", "upstream_archive")
+
+_ADDR_IN_KEY = re.compile(r"xion1[0-9a-z]{20,90}")
+_LOCK = threading.Lock()
+_INDEX: Optional[Dict[str, Tuple[int, Optional[str]]]] = None
+
+
+def set_mode(mode: str, directory: Optional[str] = None):
+    global MODE, ARCHIVE_DIR, _INDEX
+    MODE = mode
+    if directory:
+        ARCHIVE_DIR = directory
+    _INDEX = None
+
+def recording() -> bool:
+    return MODE == "record"
+
+def replaying() -> bool:
+    return MODE == "replay"
+
+
+def rest_key(url: str) -> str:
+    parts = urlsplit(url)
+    return "rest:" + parts.path + ("?" + parts.query if parts.query else "")
+
+
+def _object_path(digest: str) -> str:
+    return os.path.join(ARCHIVE_DIR, "objects", digest[:2], digest + ".z")
+
+def _load_index() -> Dict[str, Tuple[int, Optional[str]]]:
+    global _INDEX
+    if _INDEX is None:
+        index: Dict[str, Tuple[int, Optional[str]]] = {}
+        path = os.path.join(ARCHIVE_DIR, "index.jsonl")
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        e = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line after a crash
+                    _merge(index, e["k"], int(e["s"]), e.get("h"))
+        _INDEX = index
+    return _INDEX
+
+
+def _merge(index: Dict[str, Tuple[int, Optional[str]]], key: str, status: int, digest: Optional[str]) -> bool:
+    """
+    Newest entry wins, except that a failure never replaces a success: with several
+    endpoints probed in parallel, the losers' errors must not shadow the winner's answer.
+    """
+    prev = index.get(key)
+    if prev and prev[0] == 200 and prev[1] and not (status == 200 and digest):
+        return False
+    index[key] = (status, digest)
+    return True
+
+
+def record(key: str, status: int, body: Optional[bytes]):
+    """Store one upstream response. Failed/empty responses are kept too (no body).
+    Blocking (compression + file I/O): from async code use record_async()."""
+    if not (status == 200 and body):
+        prev = _load_index().get(key)
+        if prev and prev[0] == 200 and prev[1]:
+            return
+    digest = None
+    if body:
+        digest = hashlib.sha256(body).hexdigest()
+        path = _object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(zlib.compress(body, 9))
+            os.replace(tmp, path)
+    line = json.dumps({"k": key, "s": status, "h": digest}, separators=(",", ":"))
+    with _LOCK:
+        index = _load_index()
+        os.makedirs(ARCHIVE_DIR, exist_ok=True)
+        if _merge(index, key, status, digest):
+            with open(os.path.join(ARCHIVE_DIR, "index.jsonl"), "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+async def record_async(key: str, status: int, body: Optional[bytes]):
+    await asyncio.to_thread(record, key, status, body)
+
+
+def lookup(key: str) -> Optional[Tuple[int, bytes]]:
+    """(status, body) of the latest recording for key, or None if never recorded."""
+    entry = _load_index().get(key)
+    if entry is None:
+        return None
+    status, digest = entry
+    if not digest:
+        return status, b""
+    try:
+        with open(_object_path(digest), "rb") as f:
+            return status, zlib.decompress(f.read())
+    except (OSError, zlib.error):
+        return None
+
+
+def archived_addresses() -> List[str]:
+    seen = set()
+    for key in _load_index():
+        seen.update(_ADDR_IN_KEY.findall(key))
+    return sorted(seen)
@@ -1,4 +1,7 @@
+import os
 import time
+import asyncio
+from urllib.parse import urlsplit
 
 # Very simple in-memory rate limit per IP
 RATE_LIMIT = {}
@@ -16,5 +19,33 @@ def rate_limiter(ip: str):
     RATE_LIMIT[ip].append(now)
     return True
 
+# Per-node request pacing for outbound calls (0 = unlimited), e.g. for bulk screening
+NODE_QPS = float(os.getenv("XION_NODE_QPS", "0"))
+_NODE_NEXT = {}
+
+def set_node_qps(qps: float):
+    global NODE_QPS
+    NODE_QPS = max(0.0, float(qps))
+
+async def node_throttle(url: str):
+    if NODE_QPS <= 0:
+        return
+    host = urlsplit(url).netloc
+    now = time.monotonic()
+    slot = max(now, _NODE_NEXT.get(host, 0.0))
+    _NODE_NEXT[host] = slot + 1.0 / NODE_QPS
+    if slot > now:
+        await asyncio.sleep(slot - now)
+
 def rotate_endpoints(endpoints: list):
-    return endpoints[:]  # Could randomize/shuffle for true rotation
\ No newline at end of file
+    return endpoints[:]  # Could randomize/shuffle for true rotation
+
+# Shared Jinja2 environment, built on first use (normally in the app startup hook)
+_TEMPLATES = None
+
+def get_templates():
+    global _TEMPLATES
+    if _TEMPLATES is None:
+        from fastapi.templating import Jinja2Templates
+        _TEMPLATES = Jinja2Templates(directory=os.getenv("TEMPLATE_DIR", "templates"))
+    return _TEMPLATES
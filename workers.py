@@ -0,0 +1,118 @@
+"""
+Executor layer for CPU-bound stages (explorer HTML parsing, pain.001 XML building),
+so they run off the asyncio event loop.
+
+    XGUARD_WORKER_KIND           thread | process   (default: thread)
+    XGUARD_WORKERS               pool size          (default: min(4, CPUs))
+    XGUARD_WORKER_QUEUE          jobs allowed to wait for a free worker (default: 32)
+    XGUARD_WORKER_QUEUE_TIMEOUT  seconds to wait for a queue slot before PoolBusy (default: 2)
+
+Offline tools (bulk screening, archive replay) call set_queue_timeout(None) to wait for
+a free slot instead of shedding load.
+
+Queue wait (submit -> start on a worker) and execution time are recorded per stage
+separately; see pool_stats().
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+WORKER_KIND = os.getenv("XGUARD_WORKER_KIND", "thread").strip().lower()
+WORKERS = int(os.getenv("XGUARD_WORKERS", str(min(4, os.cpu_count() or 1))))
+QUEUE_SIZE = int(os.getenv("XGUARD_WORKER_QUEUE", "32"))
+QUEUE_TIMEOUT = float(os.getenv("XGUARD_WORKER_QUEUE_TIMEOUT", "2"))
+
+_EXECUTOR: Optional[Executor] = None
+_SLOTS: Optional[asyncio.Semaphore] = None
+_STATS: Dict[str, Dict[str, float]] = {}
+_IN_FLIGHT = 0
+
+
+class PoolBusy(Exception):
+    """All workers busy and the wait queue is full: caller should shed load."""
+
+
+def set_queue_timeout(seconds: Optional[float]):
+    """Seconds run_cpu() waits for a slot before PoolBusy; None waits indefinitely."""
+    global QUEUE_TIMEOUT
+    QUEUE_TIMEOUT = seconds
+
+
+def _executor() -> Executor:
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        if WORKER_KIND == "process":
+            # Imported here: pulls in multiprocessing, which thread mode never needs
+            from concurrent.futures import ProcessPoolExecutor
+            _EXECUTOR = ProcessPoolExecutor(max_workers=WORKERS)
+        else:
+            _EXECUTOR = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="xguard-cpu")
+    return _EXECUTOR
+
+def _slots() -> asyncio.Semaphore:
+    global _SLOTS
+    if _SLOTS is None:
+        _SLOTS = asyncio.Semaphore(WORKERS + QUEUE_SIZE)
+    return _SLOTS
+
+def _timed(fn: Callable, args: tuple):
+    # Runs on the worker; wall clock so timings are comparable across processes.
+    started = time.time()
+    result = fn(*args)
+    return result, started, time.time()
+
+def _stat(stage: str) -> Dict[str, float]:
+    return _STATS.setdefault(stage, {"count": 0, "rejected": 0, "errors": 0,
+                                     "wait_total": 0.0, "wait_max": 0.0,
+                                     "exec_total": 0.0, "exec_max": 0.0})
+
+
+async def run_cpu(stage: str, fn: Callable, *args) -> Any:
+    """Run fn(*args) on the worker pool. Raises PoolBusy when no slot frees up within QUEUE_TIMEOUT."""
+    global _IN_FLIGHT
+    st = _stat(stage)
+    submitted = time.time()
+    try:
+        await asyncio.wait_for(_slots().acquire(), QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        st["rejected"] += 1
+        raise PoolBusy(stage)
+    _IN_FLIGHT += 1
+    try:
+        loop = asyncio.get_running_loop()
+        result, started, finished = await loop.run_in_executor(_executor(), _timed, fn, args)
+    except Exception:
+        st["errors"] += 1
+        raise
+    finally:
+        _IN_FLIGHT -= 1
+        _slots().release()
+    wait, run = max(0.0, started - submitted), finished - started
+    st["count"] += 1
+    st["wait_total"] += wait
+    st["wait_max"] = max(st["wait_max"], wait)
+    st["exec_total"] += run
+    st["exec_max"] = max(st["exec_max"], run)
+    return result
+
+
+def pool_stats() -> Dict[str, Any]:
+    stages = {}
+    for stage, st in _STATS.items():
+        n = st["count"] or 1
+        stages[stage] = {
+            "count": int(st["count"]), "rejected": int(st["rejected"]), "errors": int(st["errors"]),
+            "wait_ms_mean": round(st["wait_total"] / n * 1000, 2), "wait_ms_max": round(st["wait_max"] * 1000, 2),
+            "exec_ms_mean": round(st["exec_total"] / n * 1000, 2), "exec_ms_max": round(st["exec_max"] * 1000, 2),
+        }
+    return {"kind": WORKER_KIND, "workers": WORKERS, "queue_size": QUEUE_SIZE,
+            "in_flight": _IN_FLIGHT, "stages": stages}
+
+
+def shutdown():
+    global _EXECUTOR, _SLOTS
+    if _EXECUTOR is not None:
+        _EXECUTOR.shutdown(wait=False, cancel_futures=True)
+    _EXECUTOR, _SLOTS = None, None
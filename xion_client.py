@@ -3,9 +3,15 @@ import os
 import re
 import time
 import asyncio
+import contextlib
+import json
 import httpx
 from typing import List, Dict, Any, Optional, Tuple
 
+import upstream_archive
+import xion_rpc
+from utils import node_throttle
+
 # =========================
 # Address validation
 # =========================
@@ -37,6 +43,8 @@ MAINNET_ENDPOINTS: List[str] = [
 DEFAULT_ENDPOINTS = MAINNET_ENDPOINTS if XION_NETWORK == "mainnet" else TESTNET_ENDPOINTS
 
 # Safe env override (comma-separated). Empty = use default list.
+# Prefix an entry with "rpc+" (e.g. rpc+https://rpc.example.com) to query it over
+# batched CometBFT JSON-RPC instead of REST — see xion_rpc.py.
 _env_list = (os.getenv("XION_API_ENDPOINTS") or "").strip()
 ENDPOINTS: List[str] = [e.strip() for e in _env_list.split(",") if e.strip()] or DEFAULT_ENDPOINTS
 
@@ -50,16 +58,120 @@ def _cb_blocked(base: str) -> bool:
     return _CB.get(base, 0) > time.time()
 
 def _cb_trip(base: str, seconds: int = 180):
+    if upstream_archive.replaying():
+        return  # archive misses are not node failures; keep replays deterministic
     _CB[base] = time.time() + seconds
 
 
+# =========================
+# Endpoint health monitor
+# =========================
+# Background poll of every endpoint's latest block: nodes that are down, slow or
+# lagging behind the others get their circuit opened before user traffic hits them.
+HEALTH_INTERVAL = float(os.getenv("XION_HEALTH_INTERVAL", "30"))   # seconds, 0 = off
+HEALTH_MAX_LAG = int(os.getenv("XION_HEALTH_MAX_LAG", "20"))       # blocks behind best node
+HEALTH_SLOW_MS = float(os.getenv("XION_HEALTH_SLOW_MS", "2500"))
+_HEALTH: Dict[str, Dict[str, Any]] = {}
+
+async def _latest_height(client: httpx.AsyncClient, base: str) -> Optional[int]:
+    if xion_rpc.is_rpc(base):
+        return await xion_rpc.fetch_latest_height(client, base)
+    r = await client.get(base.rstrip("/") + "/cosmos/base/tendermint/v1beta1/blocks/latest", timeout=3.0)
+    if r.status_code in xion_rpc.UNSUPPORTED_STATUSES:
+        return xion_rpc.HEIGHT_UNSUPPORTED
+    if r.status_code != 200:
+        return None
+    data = r.json()
+    header = ((data.get("sdk_block") or data.get("block") or {}).get("header") or {})
+    return int(header["height"]) if header.get("height") else None
+
+async def _measure(client: httpx.AsyncClient, base: str) -> Tuple[Optional[int], float]:
+    t0 = time.time()
+    try:
+        height = await _latest_height(client, base)
+    except Exception:
+        height = None
+    return height, round((time.time() - t0) * 1000, 1)
+
+async def poll_endpoints_once(client: httpx.AsyncClient) -> Dict[str, Dict[str, Any]]:
+    measured = await asyncio.gather(*(_measure(client, base) for base in ENDPOINTS))
+    best = max((h for h, _ in measured if h is not None and h >= 0), default=None)
+    for base, (height, latency_ms) in zip(ENDPOINTS, measured):
+        unsupported = height == xion_rpc.HEIGHT_UNSUPPORTED
+        if unsupported:
+            height = None
+        prev = _HEALTH.get(base, {})
+        ewma = latency_ms if not prev.get("latency_ms_ewma") else round(0.7 * prev["latency_ms_ewma"] + 0.3 * latency_ms, 1)
+        lag = (best - height) if (best is not None and height is not None) else None
+        if unsupported:
+            state = "unknown"       # answers, but has no block-height route to judge by
+        elif height is None:
+            state = "down"
+        elif lag > HEALTH_MAX_LAG:
+            state = "lagging"
+        elif latency_ms > HEALTH_SLOW_MS:
+            state = "slow"
+        else:
+            state = "ok"
+        _HEALTH[base] = {"state": state, "height": height, "lag": lag, "latency_ms": latency_ms,
+                         "latency_ms_ewma": ewma, "checked_at": round(time.time(), 3),
+                         "tripped_until": prev.get("tripped_until")}
+
+    healthy = [b for b in ENDPOINTS if _HEALTH[b]["state"] == "ok"]
+    for base in ENDPOINTS:
+        h = _HEALTH[base]
+        # Nodes are only benched while a healthy alternative exists; "unknown" never is.
+        if h["state"] in ("down", "lagging", "slow") and healthy:
+            _cb_trip(base, int(HEALTH_INTERVAL * 2) or 60)
+            h["tripped_until"] = _CB.get(base)
+        elif h.get("tripped_until") and _CB.get(base) == h["tripped_until"]:
+            _CB.pop(base, None)     # recovered: release only trips set by the monitor
+            h["tripped_until"] = None
+    return _HEALTH
+
+async def endpoint_health_loop():
+    async with httpx.AsyncClient(headers={"User-Agent": "xguard-xion/1.3"}) as client:
+        while True:
+            try:
+                await poll_endpoints_once(client)
+            except Exception as e:
+                print("Endpoint health poll error:", e)
+            await asyncio.sleep(HEALTH_INTERVAL)
+
+def endpoints_available() -> int:
+    """Endpoints whose circuit is currently closed (i.e. that a lookup would try)."""
+    return sum(not _cb_blocked(base) for base in ENDPOINTS)
+
+def endpoint_health() -> Dict[str, Dict[str, Any]]:
+    now = time.time()
+    out = {}
+    for base in ENDPOINTS:
+        h = dict(_HEALTH.get(base) or {"state": "unknown"})
+        h.pop("tripped_until", None)
+        h["circuit_open"] = _cb_blocked(base)
+        h["circuit_open_for_s"] = max(0, round(_CB.get(base, 0) - now))
+        out[base] = h
+    return out
+
+
 # =========================
 # HTTP helpers
 # =========================
 async def _get_json(client: httpx.AsyncClient, url: str, timeout: float = 5.5) -> Optional[Dict[str, Any]]:
     """GET robust JSON; if not 200 or broken JSON → None."""
+    if upstream_archive.replaying():
+        hit = upstream_archive.lookup(upstream_archive.rest_key(url))
+        if not hit or hit[0] != 200 or not hit[1]:
+            return None
+        try:
+            return json.loads(hit[1])
+        except Exception:
+            return None
     try:
+        await node_throttle(url)
         r = await client.get(url, timeout=timeout, follow_redirects=True)
+        if upstream_archive.recording():
+            await upstream_archive.record_async(upstream_archive.rest_key(url), r.status_code, r.content)
         if r.status_code != 200 or not r.content:
             return None
         try:
@@ -67,6 +179,8 @@ async def _get_json(client: httpx.AsyncClient, url: str, timeout: float = 5.5) -
         except Exception:
             return None
     except Exception:
+        if upstream_archive.recording():
+            await upstream_archive.record_async(upstream_archive.rest_key(url), 0, None)
         return None
 
 
@@ -192,17 +306,41 @@ async def _fetch_tx_count(client: httpx.AsyncClient, base: str, address: str) ->
 # =========================
 # Probe one endpoint
 # =========================
+async def _fetch_rest_parts(client: httpx.AsyncClient, base: str, address: str) -> Dict[str, Any]:
+    # Liveness: account
+    acct = await _fetch_first_ok(client, base, _account_paths(address))
+
+    # Balances
+    balances = await _fetch_first_ok(client, base, _balance_paths(address))
+
+    # Dead node: skip the remaining calls (the probe trips the breaker)
+    if _parse_balances_shape(balances) is None and not (isinstance(acct, dict) and acct.get("account")):
+        return {"acct": acct, "balances": balances}
+
+    return {
+        "acct": acct,
+        "balances": balances,
+        "spendables": await _fetch_first_ok(client, base, _spendable_paths(address)),
+        "deleg": await _get_json(client, base.rstrip("/") + f"/cosmos/staking/v1beta1/delegations/{address}"),
+        "unb": await _get_json(client, base.rstrip("/") + f"/cosmos/staking/v1beta1/delegations/{address}/unbonding_delegations"),
+        "tx_count": await _fetch_tx_count(client, base, address),
+    }
+
 async def _probe_endpoint(client: httpx.AsyncClient, base: str, address: str) -> Tuple[str, Optional[Dict[str, Any]], str]:
     if _cb_blocked(base):
         return base, None, "circuit_open"
 
     try:
-        # Liveness: account
-        acct = await _fetch_first_ok(client, base, _account_paths(address))
+        if xion_rpc.is_rpc(base):
+            parts = await xion_rpc.fetch_wallet_parts(client, base, address)
+            if parts is None:
+                _cb_trip(base)
+                return base, None, f"{base} rpc_batch_failed"
+        else:
+            parts = await _fetch_rest_parts(client, base, address)
 
-        # Balances
-        balances = await _fetch_first_ok(client, base, _balance_paths(address))
-        blist = _parse_balances_shape(balances)
+        acct = parts["acct"]
+        blist = _parse_balances_shape(parts["balances"])
 
         # If balances missing but account exists → treat as zero-balance OK
         debug = "ok_with_balances"
@@ -214,11 +352,11 @@ async def _probe_endpoint(client: httpx.AsyncClient, base: str, address: str) ->
                 _cb_trip(base)
                 return base, None, f"{base} empty_balances_and_no_acct"
 
-        spendables = await _fetch_first_ok(client, base, _spendable_paths(address)) or {}
-        deleg      = await _get_json(client, base.rstrip("/") + f"/cosmos/staking/v1beta1/delegations/{address}") or {}
-        unb        = await _get_json(client, base.rstrip("/") + f"/cosmos/staking/v1beta1/delegations/{address}/unbonding_delegations") or {}
+        spendables = parts.get("spendables") or {}
+        deleg      = parts.get("deleg") or {}
+        unb        = parts.get("unb") or {}
 
-        tx_count = await _fetch_tx_count(client, base, address)
+        tx_count = parts.get("tx_count")
         status = "ok" if tx_count is not None else "partial"
         tx_count = tx_count or 0
 
@@ -269,20 +407,29 @@ async def get_wallet_info(address: str) -> Dict[str, Any]:
     t0 = time.time()
     reasons: List[str] = []
 
-    async with httpx.AsyncClient(headers={"User-Agent": "xguard-xion/1.3"}, timeout=5.5) as client:
+    # Replay never touches the network, so skip building a client (and its SSL context).
+    client_cm = (contextlib.nullcontext() if upstream_archive.replaying()
+                 else httpx.AsyncClient(headers={"User-Agent": "xguard-xion/1.3"}, timeout=5.5))
+    async with client_cm as client:
         tasks = [asyncio.create_task(_probe_endpoint(client, base, address))
                  for base in ENDPOINTS if not _cb_blocked(base)]
-
-        for fut in asyncio.as_completed(tasks):
-            base, result, reason = await fut
-            if result is not None:
-                result.update({
-                    "address": address,
-                    "duration": round(time.time() - t0, 3),
-                    "anomaly": (result["uxion"] == 0.0 and result["tx_count"] == 0),
-                })
-                return result
-            reasons.append(reason)
+        try:
+            for fut in asyncio.as_completed(tasks):
+                base, result, reason = await fut
+                if result is not None:
+                    result.update({
+                        "address": address,
+                        "duration": round(time.time() - t0, 3),
+                        "anomaly": (result["uxion"] == 0.0 and result["tx_count"] == 0),
+                    })
+                    return result
+                reasons.append(reason)
+        finally:
+            # Stop the losing probes before the client closes, so they don't fail on a
+            # closed client (tripping breakers, recording errors, using throttle slots).
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
 
     last_reason = reasons[-1] if reasons else "unknown"
     return {
@@ -1,14 +1,50 @@
+import asyncio
 import requests
 from bs4 import BeautifulSoup
 import re
 
-def get_xion_explorer_assets(address: str):
+import upstream_archive
+from utils import node_throttle
+from workers import run_cpu
+
+def _fetch_explorer_html(url: str):
+    key = "explorer:" + url
+    if upstream_archive.replaying():
+        status, body = upstream_archive.lookup(key) or (0, b"")
+        return status, body.decode("utf-8", "replace")
+    try:
+        r = requests.get(url, timeout=8)
+    except Exception:
+        if upstream_archive.recording():
+            upstream_archive.record(key, 0, None)
+        raise
+    if upstream_archive.recording():
+        upstream_archive.record(key, r.status_code, r.content)
+    return r.status_code, r.text
+
+def _explorer_url(address: str) -> str:
     # URL explorer mainnet burnt.com (2025)
-    url = f"https://explorer.burnt.com/xion/account/{address}"
-    r = requests.get(url, timeout=8)
-    if r.status_code != 200 or not r.text:
+    return f"https://explorer.burnt.com/xion/account/{address}"
+
+def get_xion_explorer_assets(address: str):
+    status, html = _fetch_explorer_html(_explorer_url(address))
+    if status != 200 or not html:
+        return []
+    return parse_explorer_assets(html)
+
+async def get_xion_explorer_assets_async(address: str):
+    """Same as get_xion_explorer_assets, without blocking the event loop:
+    the fetch runs in a thread and the HTML parse on the CPU worker pool."""
+    url = _explorer_url(address)
+    if not upstream_archive.replaying():
+        await node_throttle(url)
+    status, html = await asyncio.to_thread(_fetch_explorer_html, url)
+    if status != 200 or not html:
         return []
-    soup = BeautifulSoup(r.text, "html.parser")
+    return await run_cpu("explorer_parse", parse_explorer_assets, html)
+
+def parse_explorer_assets(html: str):
+    soup = BeautifulSoup(html, "html.parser")
     out = []
 
     # Cari semua div yang ada asset, pattern: "amount symbol"
@@ -4,13 +4,11 @@ from typing import Any, Dict
 
 from fastapi import APIRouter, Request, Form
 from fastapi.responses import HTMLResponse, JSONResponse
-from fastapi.templating import Jinja2Templates
 
 from xion_client import get_wallet_info, validate_wallet_address
-from xion_explorer_scraper import get_xion_explorer_assets
+from utils import get_templates
 
 router = APIRouter()
-TEMPLATES = Jinja2Templates(directory=os.getenv("TEMPLATE_DIR", "templates"))
 
 def risk_score(wallet: Dict[str, Any]) -> int:
     score = 100
@@ -39,7 +37,7 @@ def ctx_base(request: Request) -> Dict[str, Any]:
 
 @router.get("/", response_class=HTMLResponse)
 async def index_html(request: Request):
-    return TEMPLATES.TemplateResponse("index.html", ctx_base(request))
+    return get_templates().TemplateResponse("index.html", ctx_base(request))
 
 @router.post("/validate", response_class=HTMLResponse)
 async def validate_html(request: Request, wallet_addr: str = Form(...)):
@@ -52,7 +50,7 @@ async def validate_html(request: Request, wallet_addr: str = Form(...)):
             "wallet": {"address": wallet_addr},
             "score": 1,
         })
-        return TEMPLATES.TemplateResponse("index.html", ctx)
+        return get_templates().TemplateResponse("index.html", ctx)
 
     # Force mainnet burnt.com endpoint
     os.environ["XION_API_ENDPOINTS"] = "https://api.xion-mainnet-1.burnt.com"
@@ -67,7 +65,8 @@ async def validate_html(request: Request, wallet_addr: str = Form(...)):
     # Only fallback if REST node returns totally empty
     if uxion_val == 0.0 and tx_count_val == 0:
         try:
-            fallback_assets = get_xion_explorer_assets(wallet_addr)
+            from xion_explorer_scraper import get_xion_explorer_assets_async
+            fallback_assets = await get_xion_explorer_assets_async(wallet_addr)
             print("[DEBUG] Fallback explorer assets:", fallback_assets)
             if fallback_assets:
                 # PATCH: Ambil semua XION dari explorer assets (liquid, staked, reward)
@@ -103,7 +102,7 @@ async def validate_html(request: Request, wallet_addr: str = Form(...)):
         },
     })
     ctx["score"] = risk_score({"uxion": uxion_val, "tx_count": ctx["wallet"]["tx_count"], "anomaly": ctx["wallet"]["anomaly"], "status": display_status})
-    return TEMPLATES.TemplateResponse("index.html", ctx)
+    return get_templates().TemplateResponse("index.html", ctx)
 
 @router.post("/api/validate")
 async def validate_api(request: Request, wallet_addr: str = Form(None)):
@@ -129,7 +128,8 @@ async def validate_api(request: Request, wallet_addr: str = Form(None)):
 
     if uxion_val == 0.0 and tx_count_val == 0:
         try:
-            fallback_assets = get_xion_explorer_assets(wallet_addr)
+            from xion_explorer_scraper import get_xion_explorer_assets_async
+            fallback_assets = await get_xion_explorer_assets_async(wallet_addr)
             if fallback_assets:
                 uxion_balances = [
                     float(a["amount"].replace(",", ""))
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+CometBFT JSON-RPC transport for wallet lookups.
+
+Endpoints listed as "rpc+https://host" in XION_API_ENDPOINTS use this path instead of
+REST/LCD: the bank, auth and staking gRPC queries go out as `abci_query` calls and the
+tx counts as `tx_search` calls, all in ONE batched JSON-RPC POST. Protobuf requests and
+responses are encoded/decoded by the minimal codec below (only the fields we read) and
+returned in the same JSON shapes as the REST endpoints, so the scoring code is shared.
+"""
+import base64
+import json
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+import upstream_archive
+from utils import node_throttle
+
+RPC_PREFIX = "rpc+"
+PAGE_LIMIT = 1000
+
+# abci_query gRPC paths
+Q_ACCOUNT = "/cosmos.auth.v1beta1.Query/Account"
+Q_BALANCES = "/cosmos.bank.v1beta1.Query/AllBalances"
+Q_SPENDABLE = "/cosmos.bank.v1beta1.Query/SpendableBalances"
+Q_DELEGATIONS = "/cosmos.staking.v1beta1.Query/DelegatorDelegations"
+Q_UNBONDING = "/cosmos.staking.v1beta1.Query/DelegatorUnbondingDelegations"
+
+
+def is_rpc(base: str) -> bool:
+    return base.startswith(RPC_PREFIX)
+
+def rpc_url(base: str) -> str:
+    return base[len(RPC_PREFIX):].rstrip("/") if is_rpc(base) else base.rstrip("/")
+
+
+# =========================
+# Minimal protobuf codec
+# =========================
+def _varint(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        b = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(b | 0x80)
+        else:
+            out.append(b)
+            return bytes(out)
+
+def pb_bytes(field: int, value: bytes) -> bytes:
+    return _varint((field << 3) | 2) + _varint(len(value)) + value
+
+def pb_str(field: int, value: str) -> bytes:
+    return pb_bytes(field, value.encode("utf-8"))
+
+def pb_uint(field: int, value: int) -> bytes:
+    return _varint(field << 3) + _varint(value)
+
+def pb_decode(buf: bytes) -> Dict[int, List[Any]]:
+    """Decode one message level: field number -> list of ints (varint) / bytes (len-delimited)."""
+    out: Dict[int, List[Any]] = {}
+    i, n = 0, len(buf)
+    while i < n:
+        key, shift = 0, 0
+        while True:
+            b = buf[i]; i += 1
+            key |= (b & 0x7F) << shift; shift += 7
+            if not b & 0x80:
+                break
+        field, wt = key >> 3, key & 7
+        if wt == 0:
+            val, shift = 0, 0
+            while True:
+                b = buf[i]; i += 1
+                val |= (b & 0x7F) << shift; shift += 7
+                if not b & 0x80:
+                    break
+        elif wt == 2:
+            ln, shift = 0, 0
+            while True:
+                b = buf[i]; i += 1
+                ln |= (b & 0x7F) << shift; shift += 7
+                if not b & 0x80:
+                    break
+            val = buf[i:i + ln]; i += ln
+        elif wt == 1:
+            val = buf[i:i + 8]; i += 8
+        elif wt == 5:
+            val = buf[i:i + 4]; i += 4
+        else:
+            raise ValueError(f"unsupported wire type {wt}")
+        out.setdefault(field, []).append(val)
+    return out
+
+def _s(msg: Dict[int, List[Any]], field: int) -> str:
+    v = msg.get(field)
+    return v[0].decode("utf-8", "replace") if v else ""
+
+
+# =========================
+# Requests
+# =========================
+def _page() -> bytes:
+    return pb_uint(3, PAGE_LIMIT)        # PageRequest.limit
+
+def _addr_paged(address: str) -> bytes:
+    return pb_str(1, address) + pb_bytes(2, _page())
+
+def wallet_batch(address: str) -> List[Dict[str, Any]]:
+    queries = [
+        (Q_ACCOUNT, pb_str(1, address)),
+        (Q_BALANCES, _addr_paged(address)),
+        (Q_SPENDABLE, _addr_paged(address)),
+        (Q_DELEGATIONS, _addr_paged(address)),
+        (Q_UNBONDING, _addr_paged(address)),
+    ]
+    batch = [
+        {"jsonrpc": "2.0", "id": i, "method": "abci_query",
+         "params": {"path": path, "data": data.hex(), "height": "0", "prove": False}}
+        for i, (path, data) in enumerate(queries)
+    ]
+    for ev in (f"message.sender='{address}'", f"transfer.recipient='{address}'"):
+        batch.append({"jsonrpc": "2.0", "id": len(batch), "method": "tx_search",
+                      "params": {"query": ev, "prove": False, "page": "1", "per_page": "1"}})
+    return batch
+
+
+# =========================
+# Responses -> REST-shaped JSON
+# =========================
+def _coins(raw_list: List[bytes]) -> List[Dict[str, str]]:
+    coins = []
+    for raw in raw_list:
+        c = pb_decode(raw)
+        coins.append({"denom": _s(c, 1), "amount": _s(c, 2) or "0"})
+    return coins
+
+def decode_balances(value: bytes) -> Dict[str, Any]:
+    return {"balances": _coins(pb_decode(value).get(1, []))}
+
+def decode_account(value: bytes) -> Dict[str, Any]:
+    any_msg = pb_decode(value).get(1)
+    if not any_msg:
+        return {}
+    return {"account": {"@type": _s(pb_decode(any_msg[0]), 1)}}
+
+def decode_delegations(value: bytes) -> Dict[str, Any]:
+    out = []
+    for raw in pb_decode(value).get(1, []):
+        d = pb_decode(raw)
+        bal = _coins(d.get(2, [])[:1])
+        out.append({"balance": bal[0] if bal else {"amount": "0"}})
+    return {"delegation_responses": out}
+
+def decode_unbonding(value: bytes) -> Dict[str, Any]:
+    out = []
+    for raw in pb_decode(value).get(1, []):
+        entries = [{"balance": _s(pb_decode(e), 4) or "0"} for e in pb_decode(raw).get(3, [])]
+        out.append({"entries": entries})
+    return {"unbonding_responses": out}
+
+_DECODERS = [decode_account, decode_balances, decode_balances, decode_delegations, decode_unbonding]
+
+def _abci_value(item: Optional[Dict[str, Any]]) -> Optional[bytes]:
+    resp = ((item or {}).get("result") or {}).get("response") or {}
+    if resp.get("code", 0) != 0:
+        return None
+    return base64.b64decode(resp.get("value") or "")
+
+
+def parse_wallet_batch(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    by_id = {it.get("id"): it for it in items if isinstance(it, dict)}
+    parts: List[Optional[Dict[str, Any]]] = []
+    for i, decode in enumerate(_DECODERS):
+        try:
+            value = _abci_value(by_id.get(i))
+            parts.append(decode(value) if value is not None else None)
+        except (ValueError, IndexError):
+            parts.append(None)
+    total, saw = 0, False
+    for i in (5, 6):
+        res = (by_id.get(i) or {}).get("result")
+        if isinstance(res, dict) and "total_count" in res:
+            saw = True
+            try:
+                total += int(str(res["total_count"]))
+            except Exception:
+                pass
+    acct, balances, spendables, deleg, unb = parts
+    return {"acct": acct, "balances": balances, "spendables": spendables,
+            "deleg": deleg, "unb": unb, "tx_count": total if saw else None}
+
+
+# =========================
+# Transport
+# =========================
+async def _post_batch(client: httpx.AsyncClient, url: str, batch: list, key: str,
+                      timeout: float = 5.5) -> Optional[list]:
+    if upstream_archive.replaying():
+        hit = upstream_archive.lookup(key)
+        if not hit or hit[0] != 200 or not hit[1]:
+            return None
+        return json.loads(hit[1])
+    try:
+        await node_throttle(url)
+        r = await client.post(url, json=batch, timeout=timeout)
+        if upstream_archive.recording():
+            await upstream_archive.record_async(key, r.status_code, r.content)
+        if r.status_code != 200 or not r.content:
+            return None
+        data = r.json()
+        return data if isinstance(data, list) else None
+    except Exception:
+        if upstream_archive.recording():
+            await upstream_archive.record_async(key, 0, None)
+        return None
+
+
+# Returned instead of a height when the node does not serve the height route at all
+# (404/501): its health is unknown rather than down.
+HEIGHT_UNSUPPORTED = -1
+UNSUPPORTED_STATUSES = (404, 501)
+
+async def fetch_latest_height(client: httpx.AsyncClient, base: str, timeout: float = 3.0) -> Optional[int]:
+    """Latest block height from CometBFT /status (cheap, used by the health monitor)."""
+    r = await client.get(rpc_url(base) + "/status", timeout=timeout)
+    if r.status_code in UNSUPPORTED_STATUSES:
+        return HEIGHT_UNSUPPORTED
+    if r.status_code != 200:
+        return None
+    info = (r.json().get("result") or {}).get("sync_info") or {}
+    return int(info["latest_block_height"]) if info.get("latest_block_height") else None
+
+
+async def fetch_wallet_parts(client: httpx.AsyncClient, base: str, address: str) -> Optional[Dict[str, Any]]:
+    """One round-trip for everything _probe_endpoint needs; None if the node did not answer."""
+    items = await _post_batch(client, rpc_url(base), wallet_batch(address), f"rpc:wallet:{address}")
+    if items is None:
+        return None
+    return parse_wallet_batch(items)